@@ -1,6 +1,59 @@
 import json
+from dns_parser import name_to_key, key_to_name, find_suffix
 
+# Blocked names and "*." wildcard suffixes, both as lowercase wire-format keys
 blocklist = set()
+wildcard_blocklist = set()
+
+def _entry_key(domain):
+    """
+    Split a blocklist entry into its lookup table and wire-format key.
+
+    Args:
+        domain (str): Domain to block, optionally prefixed with "*.".
+
+    Returns:
+        tuple: (set, bytes) The table the entry belongs to and its key.
+    """
+    if domain.startswith("*."):
+        return wildcard_blocklist, name_to_key(domain[2:])
+    return blocklist, name_to_key(domain)
+
+def iter_load_blocklist(file_path, batch_size=500):
+    """
+    Load the blocklist from a file in batches.
+
+    Entries are added to the current blocklist, so domains blocked at runtime
+    and not yet saved are kept. Invalid entries are skipped and counted. The
+    generator yields after every batch of entries so a caller on the event loop
+    can let the DNS path run between batches. Errors reading the file are
+    raised to the caller.
+
+    Args:
+        file_path (str): Path to the blocklist file.
+        batch_size (int): Number of entries to add between yields.
+
+    Yields:
+        int: Number of entries read so far.
+    """
+    count = 0
+    invalid = 0
+    with open(file_path, "r") as f:
+        for line in f:
+            domain = line.strip()
+            if domain and not domain.startswith("#"):
+                try:
+                    table, key = _entry_key(domain)
+                except ValueError:
+                    invalid += 1
+                    continue
+                table.add(key)
+                count += 1
+                if count % batch_size == 0:
+                    yield count
+    if invalid:
+        print(f"Skipped {invalid} invalid entries in {file_path}.")
+    print(f"Blocklist loaded with {count_blocked_domains()} entries.")
 
 def load_blocklist(file_path):
     """
@@ -8,19 +61,43 @@ def load_blocklist(file_path):
 
     Args:
         file_path (str): Path to the blocklist file.
+
+    Returns:
+        bool: True if the blocklist was loaded.
     """
-    global blocklist
     try:
-        with open(file_path, "r") as f:
-            for line in f:
-                domain = line.strip()
-                if domain and not domain.startswith("#"):
-                    blocklist.add(domain)
-        print(f"Blocklist loaded with {len(blocklist)} entries.")
+        for _ in iter_load_blocklist(file_path):
+            pass
+        return True
     except FileNotFoundError:
         print(f"Blocklist file {file_path} not found. Starting with an empty blocklist.")
     except Exception as e:
         print(f"Error loading blocklist: {e}")
+    return False
+
+def iter_save_blocklist(file_path, batch_size=500):
+    """
+    Save the blocklist to a file in batches.
+
+    The generator yields after every batch of lines written so a caller on the
+    event loop can let the DNS path run between batches. Errors writing the
+    file are raised to the caller.
+
+    Args:
+        file_path (str): Path to the blocklist file.
+        batch_size (int): Number of entries to write between yields.
+
+    Yields:
+        int: Number of entries written so far.
+    """
+    count = 0
+    with open(file_path, "w") as f:
+        for domain in iter_blocked_domains():
+            f.write(domain + "\n")
+            count += 1
+            if count % batch_size == 0:
+                yield count
+    print(f"Blocklist saved to {file_path}.")
 
 def save_blocklist(file_path):
     """
@@ -28,14 +105,17 @@ def save_blocklist(file_path):
 
     Args:
         file_path (str): Path to the blocklist file.
+
+    Returns:
+        bool: True if the blocklist was saved.
     """
     try:
-        with open(file_path, "w") as f:
-            for domain in blocklist:
-                f.write(domain + "\n")
-        print(f"Blocklist saved to {file_path}.")
+        for _ in iter_save_blocklist(file_path):
+            pass
+        return True
     except Exception as e:
         print(f"Error saving blocklist: {e}")
+        return False
 
 def add_to_blocklist(domain):
     """
@@ -43,12 +123,17 @@ def add_to_blocklist(domain):
 
     Args:
         domain (str): Domain to block.
+
+    Returns:
+        bool: True if the domain was added, False if it was already blocked.
     """
-    if domain not in blocklist:
-        blocklist.add(domain)
+    table, key = _entry_key(domain)
+    if key not in table:
+        table.add(key)
         print(f"Added {domain} to blocklist.")
-    else:
-        print(f"{domain} is already in the blocklist.")
+        return True
+    print(f"{domain} is already in the blocklist.")
+    return False
 
 def remove_from_blocklist(domain):
     """
@@ -56,33 +141,61 @@ def remove_from_blocklist(domain):
 
     Args:
         domain (str): Domain to unblock.
+
+    Returns:
+        bool: True if the domain was removed, False if it was not blocked.
     """
-    if domain in blocklist:
-        blocklist.remove(domain)
+    table, key = _entry_key(domain)
+    if key in table:
+        table.remove(key)
         print(f"Removed {domain} from blocklist.")
-    else:
-        print(f"{domain} not found in blocklist.")
+        return True
+    print(f"{domain} not found in blocklist.")
+    return False
 
 def is_blocked(domain):
     """
     Check if a domain is blocked, including wildcard matching.
 
     Args:
-        domain (str): The domain to check.
+        domain (str | bytes): The domain to check, as a name or a wire-format key.
 
     Returns:
         bool: True if the domain is blocked, False otherwise.
     """
+    key = name_to_key(domain) if isinstance(domain, str) else domain
+
     # Exact match
-    if domain in blocklist:
+    if key in blocklist:
         return True
 
-    # Wildcard match (e.g., *.example.com)
-    for blocked_domain in blocklist:
-        if blocked_domain.startswith("*.") and domain.endswith(blocked_domain[2:]):
-            return True
+    # Wildcard match (e.g., *.example.com) on label boundaries
+    return find_suffix(key, wildcard_blocklist) is not None
 
-    return False
+def _blocked_names(exact, wildcards):
+    for key in exact:
+        yield key_to_name(key)
+    for key in wildcards:
+        yield "*." + key_to_name(key)
+
+def iter_blocked_domains():
+    """
+    Iterate over a snapshot of the blocklist, decoding names as they are consumed.
+
+    The keys are copied up front, so the blocklist may be modified while the
+    iterator is still being consumed, e.g. across awaits on the event loop.
+
+    Returns:
+        iterator: Each blocked domain, with "*." in front of wildcard entries.
+    """
+    return _blocked_names(list(blocklist), list(wildcard_blocklist))
+
+def count_blocked_domains():
+    """
+    Returns:
+        int: Number of entries in the blocklist.
+    """
+    return len(blocklist) + len(wildcard_blocklist)
 
 def list_blocked_domains():
     """
@@ -91,4 +204,4 @@ def list_blocked_domains():
     Returns:
         set: The set of blocked domains.
     """
-    return blocklist
+    return set(iter_blocked_domains())
@@ -0,0 +1,273 @@
+try:
+    import uasyncio as asyncio
+except ImportError:
+    import asyncio
+import gc
+
+from custom_resolver import (
+    add_custom_domain,
+    remove_custom_domain,
+    list_custom_domains,
+    save_custom_domains_to_file,
+    load_custom_domains_from_file,
+    load_zone_file,
+    ZONE_ERROR,
+    ZONE_LOADED,
+    ZONE_UNCHANGED,
+    unload_zone,
+    list_zones,
+    zone_files,
+)
+from blocklist import (
+    iter_load_blocklist,
+    iter_save_blocklist,
+    add_to_blocklist,
+    remove_from_blocklist,
+    iter_blocked_domains,
+    count_blocked_domains,
+)
+from dns_parser import name_to_key
+import dns_server
+
+CONTROL_PORT = 5380  # TCP port of the management interface
+BATCH_SIZE = 500  # Entries applied or written between yields to the DNS path
+DOMAIN_COMMANDS = ("add", "remove", "block", "unblock")  # Commands taking a domain argument
+
+HELP = (
+    "add <domain> <ip>       - Add a custom domain",
+    "remove <domain>         - Remove a custom domain",
+    "list_domains            - List all custom domains",
+    "save_domains            - Save custom domains to a file",
+    "load_domains            - Replace custom domains with those in the file",
+    "load_zone <file>        - Load or update a zone file",
+    "unload_zone <origin>    - Stop serving a zone",
+    "reload_zones            - Reload zone files whose serial changed",
+    "list_zones              - List all local zones",
+    "block <domain>          - Block a domain",
+    "unblock <domain>        - Unblock a domain",
+    "import_blocklist <file> - Add every domain in a file to the blocklist",
+    "list_blocked            - List all blocked domains",
+    "save_blocklist          - Save the blocklist to a file",
+    "view_cache              - Show cached domains and their remaining TTL",
+    "flush_cache             - Remove all entries from the DNS cache",
+    "stats                   - Show query and memory statistics",
+    "reload                  - Add blocklist and custom domain entries from their files, reload zones",
+    "exit                    - Close the session",
+)
+
+
+async def apply_in_batches(batches):
+    """
+    Drive a batched loader or writer, yielding to the event loop after every batch.
+
+    Args:
+        batches (iterator): A generator that yields once per batch, such as
+            iter_load_blocklist().
+
+    Returns:
+        bool: True if the loader finished, False if it raised an error.
+    """
+    try:
+        for _ in batches:
+            await asyncio.sleep(0)
+        return True
+    except FileNotFoundError as e:
+        print(f"File not found: {e}")
+    except Exception as e:
+        print(f"Error applying batches: {e}")
+    return False
+
+
+class ControlServer:
+    """
+    Line-based management interface served on the DNS server's event loop.
+
+    Each request is one command line. The reply is zero or more output lines
+    followed by a final "OK" or "ERROR <reason>" line.
+    """
+
+    def __init__(self, blocklist_file="blocklist.txt", domains_file="custom_domains.json", batch_size=BATCH_SIZE):
+        """
+        Args:
+            blocklist_file (str): Blocklist used by save_blocklist and reload.
+            domains_file (str): Custom domains file used by save/load_domains and reload.
+            batch_size (int): Entries handled between yields to the DNS path.
+        """
+        self.blocklist_file = blocklist_file
+        self.domains_file = domains_file
+        self.batch_size = batch_size
+        self.server = None
+
+    async def start(self, host="0.0.0.0", port=CONTROL_PORT):
+        """
+        Start accepting management connections.
+
+        Args:
+            host (str): Address to bind to.
+            port (int): TCP port to listen on.
+        """
+        self.server = await asyncio.start_server(self.handle_client, host, port)
+        print(f"Management interface is running on TCP port {port}...")
+
+    async def handle_client(self, reader, writer):
+        """
+        Serve one management connection until the client exits or disconnects.
+        """
+        try:
+            writer.write(b"pico_dns management interface. Type 'help' for commands.\n")
+            await writer.drain()
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                command = line.decode().strip().split()
+                if command and command[0] in ("exit", "quit"):
+                    await self.send(writer, ["OK"])
+                    break
+                await self.execute(command, writer)
+        except Exception as e:
+            print(f"Management connection error: {e}")
+        finally:
+            writer.close()
+            await writer.wait_closed()
+
+    async def send(self, writer, lines):
+        """
+        Write reply lines, draining the stream after every batch.
+
+        Args:
+            writer (StreamWriter): The client stream.
+            lines (iterable): Lines to send, without newlines.
+        """
+        count = 0
+        for line in lines:
+            writer.write((line + "\n").encode())
+            count += 1
+            if count % self.batch_size == 0:
+                await writer.drain()
+        await writer.drain()
+
+    async def reload(self):
+        """
+        Reload the blocklist, custom domains and zone files in batches.
+
+        Blocklist entries and custom domains from the files are added to the
+        current ones, so changes made at runtime and not yet saved are kept.
+
+        Returns:
+            bool: True if every file was reloaded without errors.
+        """
+        ok = await apply_in_batches(iter_load_blocklist(self.blocklist_file, self.batch_size))
+        ok = load_custom_domains_from_file(self.domains_file, replace=False) and ok
+        await asyncio.sleep(0)
+        recompiled, failed = await self.reload_zones()
+        return ok and not failed
+
+    async def reload_zones(self):
+        """
+        Reload zone files one at a time, yielding between files.
+
+        Returns:
+            tuple: (number of zones recompiled, number of files that failed to load).
+        """
+        recompiled = 0
+        failed = 0
+        for file_path in list(zone_files):
+            result = load_zone_file(file_path)
+            if result == ZONE_LOADED:
+                recompiled += 1
+            elif result == ZONE_ERROR:
+                failed += 1
+            await asyncio.sleep(0)
+        return recompiled, failed
+
+    def stats(self):
+        """
+        Returns:
+            list: Lines describing query counters, table sizes and memory use.
+        """
+        lines = [f"{name}: {count}" for name, count in dns_server.stats.items()]
+        lines.append(f"cache_entries: {len(dns_server.dns_cache)}")
+        lines.append(f"blocked_domains: {count_blocked_domains()}")
+        lines.append(f"custom_domains: {len(list_custom_domains())}")
+        lines.append(f"zones: {len(list_zones())}")
+        lines.append(f"rx_buffers_free: {dns_server.rx_pool.available()}/{dns_server.rx_pool.capacity}")
+        lines.append(f"tx_buffers_free: {dns_server.tx_pool.available()}/{dns_server.tx_pool.capacity}")
+        lines.append(f"buffer_pool_misses: {dns_server.rx_pool.misses + dns_server.tx_pool.misses}")
+        if hasattr(gc, "mem_free"):
+            lines.append(f"mem_free: {gc.mem_free()}")
+            lines.append(f"mem_alloc: {gc.mem_alloc()}")
+        return lines
+
+    async def execute(self, command, writer):
+        """
+        Run one management command and write its reply.
+
+        Args:
+            command (list): The command name followed by its arguments.
+            writer (StreamWriter): The client stream.
+        """
+        if not command:
+            return
+
+        cmd = command[0]
+        if cmd in DOMAIN_COMMANDS and len(command) > 1:
+            try:
+                name_to_key(command[1])
+            except ValueError:
+                await self.send(writer, ["ERROR invalid domain"])
+                return
+
+        output = []
+        ok = True
+        if cmd == "add" and len(command) == 3:
+            add_custom_domain(command[1], command[2])
+        elif cmd == "remove" and len(command) == 2:
+            ok = remove_custom_domain(command[1])
+        elif cmd == "list_domains":
+            output = [f"{domain} -> {ip}" for domain, ip in list_custom_domains().items()]
+        elif cmd == "save_domains":
+            ok = save_custom_domains_to_file(self.domains_file)
+        elif cmd == "load_domains":
+            ok = load_custom_domains_from_file(self.domains_file)
+        elif cmd == "load_zone" and len(command) == 2:
+            result = load_zone_file(command[1])
+            if result == ZONE_UNCHANGED:
+                output = ["Zone unchanged."]
+            ok = result != ZONE_ERROR
+        elif cmd == "unload_zone" and len(command) == 2:
+            ok = unload_zone(command[1])
+        elif cmd == "reload_zones":
+            recompiled, failed = await self.reload_zones()
+            output = [f"Recompiled {recompiled} zone(s)."]
+            ok = not failed
+        elif cmd == "list_zones":
+            output = [f"{origin} (serial {serial})" for origin, serial in list_zones().items()]
+        elif cmd == "block" and len(command) == 2:
+            ok = add_to_blocklist(command[1])
+        elif cmd == "unblock" and len(command) == 2:
+            ok = remove_from_blocklist(command[1])
+        elif cmd == "import_blocklist" and len(command) == 2:
+            before = count_blocked_domains()
+            ok = await apply_in_batches(iter_load_blocklist(command[1], self.batch_size))
+            output = [f"Imported {count_blocked_domains() - before} new entries."]
+        elif cmd == "list_blocked":
+            output = iter_blocked_domains()
+        elif cmd == "save_blocklist":
+            ok = await apply_in_batches(iter_save_blocklist(self.blocklist_file, self.batch_size))
+        elif cmd == "view_cache":
+            output = (f"{domain} ({ttl}s)" for domain, ttl in dns_server.iter_cache())
+        elif cmd == "flush_cache":
+            output = [f"Flushed {dns_server.flush_cache()} entries."]
+        elif cmd == "stats":
+            output = self.stats()
+        elif cmd == "reload":
+            ok = await self.reload()
+        elif cmd == "help":
+            output = HELP
+        else:
+            await self.send(writer, ["ERROR invalid command, type 'help' for usage"])
+            return
+
+        await self.send(writer, output)
+        await self.send(writer, ["OK" if ok else "ERROR command failed"])
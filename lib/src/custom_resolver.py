@@ -1,6 +1,37 @@
 import json
+import os
+from dns_parser import name_to_key, key_to_name, find_suffix, create_error_response
+from zone_engine import Zone, TYPE_SOA, CLASS_IN, parse_zone, soa_serial, reverse_records, create_zone_response
 
+# Mappings keyed by lowercase wire-format name; "*." wildcards are keyed by their suffix
 custom_domains = {}
+wildcard_domains = {}
+
+# Results of load_zone_file()
+ZONE_LOADED = "loaded"
+ZONE_UNCHANGED = "unchanged"
+ZONE_ERROR = "error"
+
+# Authoritative zones keyed by the wire-format key of their apex
+zones = {}
+# Zone files that have been loaded: {file_path: apex key}
+zone_files = {}
+# PTR records generated from forward zones: {reverse origin: {forward apex key: records}}
+reverse_sources = {}
+
+def _entry_key(domain):
+    """
+    Split a custom domain into its lookup table and wire-format key.
+
+    Args:
+        domain (str): The domain name, optionally prefixed with "*.".
+
+    Returns:
+        tuple: (dict, bytes) The table the mapping belongs to and its key.
+    """
+    if domain.startswith("*."):
+        return wildcard_domains, name_to_key(domain[2:])
+    return custom_domains, name_to_key(domain)
 
 def add_custom_domain(domain, ip):
     """
@@ -10,7 +41,8 @@ def add_custom_domain(domain, ip):
         domain (str): The domain name.
         ip (str): The IP address to map to.
     """
-    custom_domains[domain] = ip
+    table, key = _entry_key(domain)
+    table[key] = ip
     print(f"Added custom domain: {domain} -> {ip}")
 
 def remove_custom_domain(domain):
@@ -19,31 +51,39 @@ def remove_custom_domain(domain):
 
     Args:
         domain (str): The domain name to remove.
+
+    Returns:
+        bool: True if the mapping was removed, False if it did not exist.
     """
-    if domain in custom_domains:
-        del custom_domains[domain]
+    table, key = _entry_key(domain)
+    if key in table:
+        del table[key]
         print(f"Removed custom domain: {domain}")
-    else:
-        print(f"Domain {domain} not found.")
+        return True
+    print(f"Domain {domain} not found.")
+    return False
 
 def resolve_custom_domain(domain):
     """
     Resolve a domain using custom mappings, with support for exact and wildcard matches.
 
     Args:
-        domain (str): The domain name.
+        domain (str | bytes): The domain name, or its wire-format key.
 
     Returns:
         str: The resolved IP address or None if not found.
     """
+    key = name_to_key(domain) if isinstance(domain, str) else domain
+
     # Exact match
-    if domain in custom_domains:
-        return custom_domains[domain]
+    ip = custom_domains.get(key)
+    if ip:
+        return ip
 
-    # Wildcard match (e.g., *.example.com)
-    for key, ip in custom_domains.items():
-        if key.startswith("*.") and domain.endswith(key[2:]):
-            return ip
+    # Wildcard match (e.g., *.example.com) on label boundaries
+    suffix = find_suffix(key, wildcard_domains)
+    if suffix is not None:
+        return wildcard_domains[suffix]
 
     return None
 
@@ -54,7 +94,10 @@ def list_custom_domains():
     Returns:
         dict: The dictionary of custom domains and their mappings.
     """
-    return custom_domains
+    domains = {key_to_name(key): ip for key, ip in custom_domains.items()}
+    for key, ip in wildcard_domains.items():
+        domains["*." + key_to_name(key)] = ip
+    return domains
 
 def save_custom_domains_to_file(file_path):
     """
@@ -62,27 +105,217 @@ def save_custom_domains_to_file(file_path):
 
     Args:
         file_path (str): Path to the file where mappings will be saved.
+
+    Returns:
+        bool: True if the mappings were saved.
     """
     try:
         with open(file_path, "w") as file:
-            json.dump(custom_domains, file)
+            json.dump(list_custom_domains(), file)
         print(f"Custom domains saved to {file_path}.")
+        return True
     except Exception as e:
         print(f"Error saving custom domains to file: {e}")
+        return False
 
-def load_custom_domains_from_file(file_path):
+def load_custom_domains_from_file(file_path, replace=True):
     """
     Load custom domain mappings from a JSON file.
 
     Args:
         file_path (str): Path to the file from which mappings will be loaded.
+        replace (bool): Drop the current mappings first. If False, mappings from
+            the file are added and mappings made at runtime are kept.
+
+    Returns:
+        bool: True if the mappings were loaded.
     """
-    global custom_domains
     try:
         with open(file_path, "r") as file:
-            custom_domains = json.load(file)
+            mappings = json.load(file)
+        if replace:
+            custom_domains.clear()
+            wildcard_domains.clear()
+        for domain, ip in mappings.items():
+            table, key = _entry_key(domain)
+            table[key] = ip
         print(f"Custom domains loaded from {file_path}.")
+        return True
     except FileNotFoundError:
         print(f"File {file_path} not found. Starting with an empty custom domains list.")
     except Exception as e:
         print(f"Error loading custom domains from file: {e}")
+    return False
+
+
+def _rebuild_reverse_zone(origin):
+    """
+    Recompile a generated reverse zone from the PTR records of all forward zones.
+
+    Generated zones only answer for the PTR names they contain; other names in
+    the range are resolved as if the zone did not exist. Reverse zones that
+    were loaded from a zone file are left untouched.
+
+    Args:
+        origin (str): The reverse zone origin, e.g. "1.168.192.in-addr.arpa".
+    """
+    key = name_to_key(origin)
+    if key in zone_files.values():
+        return
+    sources = reverse_sources.get(origin)
+    if not sources:
+        zones.pop(key, None)
+        return
+
+    # Borrow the SOA of the newest contributing forward zone
+    forward = max((zones[apex] for apex in sources), key=lambda zone: zone.serial)
+    records = [(origin, TYPE_SOA, forward.soa[0], forward.soa[1])]
+    for ptr_records in sources.values():
+        records.extend(ptr_records)
+    zones[key] = Zone(origin, records, partial=True)
+
+def _update_reverse_zones(apex, generated):
+    """
+    Replace the PTR records contributed by one forward zone and rebuild affected reverse zones.
+
+    Args:
+        apex (bytes): Apex key of the forward zone.
+        generated (dict): {reverse origin: records} from reverse_records().
+    """
+    affected = set(generated)
+    for origin, sources in reverse_sources.items():
+        if apex in sources:
+            del sources[apex]
+            affected.add(origin)
+    for origin, records in generated.items():
+        reverse_sources.setdefault(origin, {})[apex] = records
+    for origin in affected:
+        _rebuild_reverse_zone(origin)
+
+def load_zone_file(file_path, origin=""):
+    """
+    Compile an RFC 1035 zone file and serve it authoritatively.
+
+    If the file was loaded before and its SOA serial has not changed, the rest
+    of the file is not parsed and the compiled zone is kept. A zone can only be
+    loaded from one file at a time. PTR records for the zone's A and AAAA
+    records are generated into reverse zones.
+
+    Args:
+        file_path (str): Path to the zone file.
+        origin (str): Initial $ORIGIN for files that do not set one. By default
+            the owner of the SOA record is used.
+
+    Returns:
+        str: ZONE_LOADED if the zone was (re)compiled, ZONE_UNCHANGED if its
+            serial has not changed, or ZONE_ERROR if the file could not be loaded.
+            On error a previously loaded version of the zone keeps being served.
+    """
+    try:
+        with open(file_path, "r") as file:
+            records = parse_zone(file, origin)
+            first = next(records, None)
+            if first is None or first[1] != TYPE_SOA:
+                raise ValueError("zone file must start with an SOA record")
+
+            apex = name_to_key(first[0])
+            for other, other_apex in zone_files.items():
+                if other_apex == apex and other != file_path:
+                    raise ValueError(f"zone {first[0]} is already loaded from {other}")
+            current = zones.get(apex)
+            if zone_files.get(file_path) == apex and current and current.serial == soa_serial(first[3]):
+                print(f"Zone {first[0]} unchanged (serial {current.serial}).")
+                return ZONE_UNCHANGED
+
+            compiled = [first]
+            compiled.extend(records)
+        zone = Zone(first[0], compiled)
+    except FileNotFoundError:
+        print(f"Zone file {file_path} not found.")
+        return ZONE_ERROR
+    except Exception as e:
+        print(f"Error loading zone file {file_path}: {e}")
+        return ZONE_ERROR
+
+    previous = zone_files.get(file_path)
+    if previous is not None and previous != apex:
+        unload_zone(key_to_name(previous))
+    zones[apex] = zone
+    zone_files[file_path] = apex
+    _update_reverse_zones(apex, reverse_records(zone))
+    print(f"Loaded zone {zone.origin} (serial {zone.serial}, {len(zone.records)} records).")
+    return ZONE_LOADED
+
+def unload_zone(origin):
+    """
+    Stop serving a zone and drop the PTR records generated from it.
+
+    Args:
+        origin (str): The zone apex.
+
+    Returns:
+        bool: True if the zone was unloaded, False if it was not loaded.
+    """
+    apex = name_to_key(origin)
+    if zones.pop(apex, None) is None:
+        print(f"Zone {origin} not found.")
+        return False
+    for file_path, key in list(zone_files.items()):
+        if key == apex:
+            del zone_files[file_path]
+    _update_reverse_zones(apex, {})
+    print(f"Unloaded zone {origin}.")
+    return True
+
+def load_zones_from_directory(dir_path):
+    """
+    Load every "*.zone" file in a directory.
+
+    Args:
+        dir_path (str): Directory containing zone files.
+    """
+    try:
+        names = os.listdir(dir_path)
+    except OSError:
+        print(f"Zone directory {dir_path} not found. No local zones loaded.")
+        return
+    for name in sorted(names):
+        if name.endswith(".zone"):
+            load_zone_file(dir_path + "/" + name)
+
+def resolve_zone(query, buf=None):
+    """
+    Answer a query authoritatively if its name falls inside a loaded zone.
+
+    Args:
+        query (dict): Parsed DNS query fields.
+        buf (bytearray): Optional transmit buffer to build the response in.
+
+    Names inside a zone are never passed on: if no answer can be built, a
+    SERVFAIL response is returned instead.
+
+    Returns:
+        bytes | memoryview: The response packet, or None if no zone covers the name.
+    """
+    if query["class"] not in (CLASS_IN, 255):
+        return None
+    key = query["key"]
+    apex = find_suffix(key, zones)
+    # Names a generated reverse zone has no PTR for fall through to an enclosing zone
+    while apex is not None and not zones[apex].covers(key):
+        apex = find_suffix(apex[1 + apex[0]:], zones)
+    if apex is None:
+        return None
+    response = create_zone_response(query, zones[apex], buf)
+    if response is None:
+        response = create_error_response(query, 2, buf)  # SERVFAIL
+    return response
+
+def list_zones():
+    """
+    List all loaded zones.
+
+    Returns:
+        dict: {zone apex: serial}
+    """
+    return {zone.origin: zone.serial for zone in zones.values()}
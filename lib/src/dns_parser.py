@@ -1,38 +1,63 @@
 import struct
+from random import getrandbits
 
-def parse_dns_query(data):
+DNS_HEADER_SIZE = 12
+MAX_PACKET_SIZE = 512
+
+
+def parse_dns_query(data, length=None):
     """
     Parse a DNS query packet.
 
     Args:
-        data (bytes): Raw DNS query packet.
+        data (bytes | bytearray | memoryview): Raw DNS query packet. This may be a
+            pooled receive buffer that is larger than the packet itself.
+        length (int): Number of valid bytes in data (default: len(data)).
 
     Returns:
-        dict: Parsed query fields including transaction ID, domain, type, and class.
+        dict: Parsed query fields including transaction ID, type, and class.
+            "key" holds the question name in canonical lowercase wire format and
+            "question_key" the same name followed by the packed type and class.
+            The name is not decoded to a string; use query_domain() for that.
     """
     try:
-        transaction_id = struct.unpack("!H", data[:2])[0]
-        flags = struct.unpack("!H", data[2:4])[0]
-        question_count = struct.unpack("!H", data[4:6])[0]
+        if length is None:
+            length = len(data)
+        if length < DNS_HEADER_SIZE:
+            raise IndexError
 
-        offset = 12
-        domain_parts = []
+        transaction_id, flags, question_count = struct.unpack_from("!HHH", data, 0)
+
+        offset = DNS_HEADER_SIZE
         while data[offset] != 0:
-            length = data[offset]
-            offset += 1
-            domain_parts.append(data[offset:offset + length].decode())
-            offset += length
-        domain = ".".join(domain_parts)
+            offset += 1 + data[offset]
+            if offset >= length:
+                raise IndexError
+
+        if offset + 5 > length:
+            raise IndexError
+        qtype, qclass = struct.unpack_from("!HH", data, offset + 1)
 
-        qtype, qclass = struct.unpack("!HH", data[offset + 1:offset + 5])
+        # Copy the question into the key and lowercase the name in the same pass
+        name_size = offset + 1 - DNS_HEADER_SIZE
+        question_key = bytearray(name_size + 4)
+        for i in range(name_size + 4):
+            c = data[DNS_HEADER_SIZE + i]
+            if i < name_size and 0x41 <= c <= 0x5A:
+                c |= 0x20
+            question_key[i] = c
+        question_key = bytes(question_key)
 
         return {
             "transaction_id": transaction_id,
             "flags": flags,
             "questions": question_count,
-            "domain": domain,
             "type": qtype,
-            "class": qclass
+            "class": qclass,
+            "key": question_key[:name_size],
+            "question_key": question_key,
+            "packet": data,
+            "question_end": offset + 5,
         }
     except IndexError:
         print(f"Error: Malformed DNS query data.")
@@ -41,7 +66,190 @@ def parse_dns_query(data):
         print(f"Error parsing DNS query: {e}")
         return None
 
-def create_dns_response(query, ip_address, ttl=300):
+
+def query_domain(query):
+    """
+    Decode the question name of a query as the client sent it.
+
+    Only needed for logging, so it is not done while parsing.
+
+    Args:
+        query (dict): Parsed DNS query fields.
+
+    Returns:
+        str: The dotted domain name.
+    """
+    if "domain" in query:
+        return query["domain"]
+    return key_to_name(memoryview(query["packet"])[DNS_HEADER_SIZE:query["question_end"] - 4])
+
+
+def encode_name(name):
+    """
+    Encode a dotted domain name in wire format, preserving its case.
+
+    Args:
+        name (str): The domain name.
+
+    Returns:
+        bytes: The wire-format name.
+    """
+    wire = bytearray()
+    for part in name.split("."):
+        if part:
+            encoded = part.encode()
+            if len(encoded) > 63:
+                raise ValueError(f"Label too long in {name}")
+            wire.append(len(encoded))
+            wire.extend(encoded)
+    wire.append(0)
+    return bytes(wire)
+
+
+def name_to_key(name):
+    """
+    Convert a dotted domain name to its canonical lowercase wire-format key.
+
+    Args:
+        name (str): The domain name, e.g. "Example.COM".
+
+    Returns:
+        bytes: The key, e.g. b"\\x07example\\x03com\\x00".
+    """
+    return encode_name(name.lower())
+
+
+def key_to_name(key):
+    """
+    Convert a wire-format key back to a dotted domain name.
+
+    Labels that are not valid UTF-8 are written with their non-printable bytes
+    escaped as \\DDD, as in zone files, so any name received on the wire can be
+    decoded.
+
+    Args:
+        key (bytes | memoryview): The wire-format name.
+
+    Returns:
+        str: The dotted domain name.
+    """
+    parts = []
+    offset = 0
+    while key[offset] != 0:
+        length = key[offset]
+        label = key[offset + 1:offset + 1 + length]
+        try:
+            parts.append(str(label, "utf-8"))
+        except UnicodeError:
+            parts.append("".join(
+                chr(c) if 0x20 < c < 0x7F and c not in (0x2E, 0x5C) else "\\%03d" % c
+                for c in label
+            ))
+        offset += 1 + length
+    return ".".join(parts)
+
+
+def find_suffix(key, table):
+    """
+    Find the longest suffix of a wire-format key present in table.
+
+    Suffixes are only taken at label boundaries, so the suffix for "example.com"
+    matches "example.com" and "ads.example.com" but not "badexample.com".
+
+    Args:
+        key (bytes): The wire-format name to match.
+        table (set | dict): Wire-format suffixes to match against.
+
+    Returns:
+        bytes: The matching suffix, or None if there is none.
+    """
+    if not table:
+        return None
+    offset = 0
+    while key[offset] != 0:
+        suffix = key[offset:]
+        if suffix in table:
+            return suffix
+        offset += 1 + key[offset]
+    return None
+
+
+def randomize_case(buf, start, end):
+    """
+    Apply DNS 0x20 case randomization to the letters of a wire-format name in place.
+
+    Length octets are never altered since labels are at most 63 bytes long.
+
+    Args:
+        buf (bytearray): Buffer holding the name.
+        start (int): Offset of the first length octet.
+        end (int): Offset just past the terminating zero label.
+    """
+    bits = 0
+    remaining = 0
+    for i in range(start, end):
+        c = buf[i]
+        if 0x41 <= (c & 0xDF) <= 0x5A:
+            if not remaining:
+                bits = getrandbits(30)
+                remaining = 30
+            buf[i] = (c | 0x20) if bits & 1 else (c & 0xDF)
+            bits >>= 1
+            remaining -= 1
+
+
+def _write_name(buf, offset, name):
+    """
+    Encode a dotted domain name into buf as DNS labels.
+
+    Returns:
+        int: Offset just past the terminating zero label.
+    """
+    for part in name.split("."):
+        if not part:
+            continue
+        encoded = part.encode()
+        buf[offset] = len(encoded)
+        buf[offset + 1:offset + 1 + len(encoded)] = encoded
+        offset += 1 + len(encoded)
+    buf[offset] = 0
+    return offset + 1
+
+
+def _write_header_and_question(buf, query, flags, ancount, nscount=0):
+    """
+    Write the response header and echo the question section into buf.
+
+    When the query was parsed from a raw packet the question bytes are copied
+    as-is instead of being re-encoded from the domain string.
+
+    Returns:
+        int: Offset just past the question section.
+    """
+    struct.pack_into("!HHHHHH", buf, 0, query["transaction_id"], flags, 1, ancount, nscount, 0)
+
+    packet = query.get("packet")
+    if packet is not None:
+        end = query["question_end"]
+        if packet is not buf:
+            buf[DNS_HEADER_SIZE:end] = memoryview(packet)[DNS_HEADER_SIZE:end]
+        return end
+
+    offset = _write_name(buf, DNS_HEADER_SIZE, query["domain"])
+    struct.pack_into("!HH", buf, offset, query["type"], query["class"])
+    return offset + 4
+
+
+def _finish(buf, length, pooled):
+    """
+    Return the packet as a view into a caller-owned buffer, or as bytes.
+    """
+    if pooled:
+        return memoryview(buf)[:length]
+    return bytes(buf[:length])
+
+
+def create_dns_response(query, ip_address, ttl=300, buf=None):
     """
     Create a DNS response packet for an A record.
 
@@ -49,32 +257,22 @@ def create_dns_response(query, ip_address, ttl=300):
         query (dict): Parsed DNS query fields.
         ip_address (str): IP address to map the domain to.
         ttl (int): Time-to-Live value for the response (default 300 seconds).
+        buf (bytearray): Optional transmit buffer to build the response in.
 
     Returns:
-        bytes: DNS response packet.
+        bytes | memoryview: DNS response packet, or a view into buf when given.
     """
     try:
-        transaction_id = struct.pack("!H", query["transaction_id"])
-        flags = struct.pack("!H", 0x8180)  # Standard response, no error
-        qdcount = struct.pack("!H", 1)  # Number of questions
-        ancount = struct.pack("!H", 1)  # Number of answers
-        nscount = arcount = struct.pack("!H", 0)  # No authority or additional records
-
-        # Question section (repeat query)
-        question_parts = query["domain"].split(".")
-        question_section = b"".join(len(part).to_bytes(1, "big") + part.encode() for part in question_parts) + b"\x00"
-        question_section += struct.pack("!HH", query["type"], query["class"])
-
-        # Answer section
-        answer_name = b"\xc0\x0c"  # Pointer to the domain name in the question
-        answer_type = struct.pack("!H", 1)  # A record
-        answer_class = struct.pack("!H", 1)  # IN
-        ttl_packed = struct.pack("!I", ttl)  # TTL in seconds
-        rdlength = struct.pack("!H", 4)  # IPv4 address length
-        rdata = struct.pack("!BBBB", *[int(octet) for octet in ip_address.split(".")])
-        answer_section = answer_name + answer_type + answer_class + ttl_packed + rdlength + rdata
-
-        return transaction_id + flags + qdcount + ancount + nscount + arcount + question_section + answer_section
+        out = buf if buf is not None else bytearray(MAX_PACKET_SIZE)
+        offset = _write_header_and_question(out, query, 0x8180, 1)  # Standard response, no error
+
+        # Answer section: pointer to the question name, A record, IN, TTL, IPv4 length
+        struct.pack_into("!HHHIH", out, offset, 0xC00C, 1, 1, ttl, 4)
+        offset += 12
+        struct.pack_into("!BBBB", out, offset, *[int(octet) for octet in ip_address.split(".")])
+        offset += 4
+
+        return _finish(out, offset, buf is not None)
     except ValueError:
         print(f"Error: Invalid IP address format: {ip_address}")
         return None
@@ -82,34 +280,30 @@ def create_dns_response(query, ip_address, ttl=300):
         print(f"Error creating DNS response: {e}")
         return None
 
-def create_error_response(query, error_code=3):
+
+def create_error_response(query, error_code=3, buf=None):
     """
     Create a DNS error response packet.
 
     Args:
         query (dict): Parsed DNS query fields.
         error_code (int): Error code (default 3: Name Error).
+        buf (bytearray): Optional transmit buffer to build the response in.
 
     Returns:
-        bytes: DNS error response packet.
+        bytes | memoryview: DNS error response packet, or a view into buf when given.
     """
     try:
-        transaction_id = struct.pack("!H", query["transaction_id"])
-        flags = struct.pack("!H", 0x8180 | (error_code & 0xF))  # Response with error
-        qdcount = struct.pack("!H", 1)  # Number of questions
-        ancount = nscount = arcount = struct.pack("!H", 0)  # No answers, authority, or additional records
+        out = buf if buf is not None else bytearray(MAX_PACKET_SIZE)
+        offset = _write_header_and_question(out, query, 0x8180 | (error_code & 0xF), 0)
 
-        # Question section (repeat query)
-        question_parts = query["domain"].split(".")
-        question_section = b"".join(len(part).to_bytes(1, "big") + part.encode() for part in question_parts) + b"\x00"
-        question_section += struct.pack("!HH", query["type"], query["class"])
-
-        return transaction_id + flags + qdcount + ancount + nscount + arcount + question_section
+        return _finish(out, offset, buf is not None)
     except Exception as e:
         print(f"Error creating DNS error response: {e}")
         return None
 
-def create_cname_response(query, cname, ttl=300):
+
+def create_cname_response(query, cname, ttl=300, buf=None):
     """
     Create a DNS response packet for a CNAME record.
 
@@ -117,35 +311,54 @@ def create_cname_response(query, cname, ttl=300):
         query (dict): Parsed DNS query fields.
         cname (str): Canonical name to map the domain to.
         ttl (int): Time-to-Live value for the response (default 300 seconds).
+        buf (bytearray): Optional transmit buffer to build the response in.
 
     Returns:
-        bytes: DNS response packet for a CNAME record.
+        bytes | memoryview: DNS response packet for a CNAME record, or a view into buf.
     """
     try:
-        transaction_id = struct.pack("!H", query["transaction_id"])
-        flags = struct.pack("!H", 0x8180)  # Standard response, no error
-        qdcount = struct.pack("!H", 1)  # Number of questions
-        ancount = struct.pack("!H", 1)  # Number of answers
-        nscount = arcount = struct.pack("!H", 0)  # No authority or additional records
-
-        # Question section (repeat query)
-        question_parts = query["domain"].split(".")
-        question_section = b"".join(len(part).to_bytes(1, "big") + part.encode() for part in question_parts) + b"\x00"
-        question_section += struct.pack("!HH", query["type"], query["class"])
-
-        # Answer section
-        answer_name = b"\xc0\x0c"  # Pointer to the domain name in the question
-        answer_type = struct.pack("!H", 5)  # CNAME record
-        answer_class = struct.pack("!H", 1)  # IN
-        ttl_packed = struct.pack("!I", ttl)  # TTL in seconds
-
-        # Encode the CNAME
-        cname_parts = cname.split(".")
-        cname_section = b"".join(len(part).to_bytes(1, "big") + part.encode() for part in cname_parts) + b"\x00"
-        rdlength = struct.pack("!H", len(cname_section))
-        answer_section = answer_name + answer_type + answer_class + ttl_packed + rdlength + cname_section
-
-        return transaction_id + flags + qdcount + ancount + nscount + arcount + question_section + answer_section
+        out = buf if buf is not None else bytearray(MAX_PACKET_SIZE)
+        offset = _write_header_and_question(out, query, 0x8180, 1)  # Standard response, no error
+
+        # Answer section: pointer to the question name, CNAME record, IN, TTL
+        struct.pack_into("!HHHI", out, offset, 0xC00C, 5, 1, ttl)
+        rdlength_offset = offset + 10
+        end = _write_name(out, offset + 12, cname)
+        struct.pack_into("!H", out, rdlength_offset, end - offset - 12)
+
+        return _finish(out, end, buf is not None)
     except Exception as e:
         print(f"Error creating CNAME response: {e}")
         return None
+
+
+def create_raw_response(query, flags, ancount, answers, nscount=0, authority=b"", buf=None):
+    """
+    Create a DNS response packet from precomputed wire-format sections.
+
+    Args:
+        query (dict): Parsed DNS query fields.
+        flags (int): Header flags, including the response code.
+        ancount (int): Number of records in answers.
+        answers (bytes): Encoded answer section.
+        nscount (int): Number of records in authority.
+        authority (bytes): Encoded authority section.
+        buf (bytearray): Optional transmit buffer to build the response in.
+
+    Returns:
+        bytes | memoryview: DNS response packet, or a view into buf when given.
+    """
+    try:
+        out = buf if buf is not None else bytearray(MAX_PACKET_SIZE)
+        offset = _write_header_and_question(out, query, flags, ancount, nscount)
+        if offset + len(answers) + len(authority) > len(out):
+            raise ValueError("response does not fit in the buffer")
+        end = offset + len(answers)
+        out[offset:end] = answers
+        offset, end = end, end + len(authority)
+        out[offset:end] = authority
+
+        return _finish(out, end, buf is not None)
+    except Exception as e:
+        print(f"Error creating DNS response: {e}")
+        return None
@@ -1,20 +1,83 @@
 import sys
-import uasyncio as asyncio
+try:
+    import uasyncio as asyncio
+except ImportError:
+    import asyncio
 sys.path.append('../../lib')
-from dns_parser import parse_dns_query, create_dns_response, create_error_response
-from custom_resolver import resolve_custom_domain
+from dns_parser import (
+    DNS_HEADER_SIZE,
+    parse_dns_query,
+    create_dns_response,
+    create_error_response,
+    key_to_name,
+    query_domain,
+    randomize_case,
+)
+from custom_resolver import resolve_custom_domain, resolve_zone
 from blocklist import is_blocked
+from packet_pool import PacketBufferPool
 import socket
+import struct
 import time
 import json
+import binascii
+import errno
 
 UPSTREAM_DNS = "94.140.14.14"  # AdGuard DNS
+UPSTREAM_TIMEOUT = 2  # Seconds to wait for an upstream reply
+LOG_QUERIES = True  # Per-query log lines; disable to skip decoding names on the hot path
 CACHE_TTL = 300  # Default TTL for cache entries in seconds
 CACHE_FILE = "dns_cache.json"
+RX_BUFFERS = 8  # Preallocated receive buffers; further queries wait in the socket queue
+TX_BUFFERS = 8  # Preallocated transmit buffers
 
-# Cache structure: {domain: (response, expiration_time)}
+rx_pool = PacketBufferPool(RX_BUFFERS)
+tx_pool = PacketBufferPool(TX_BUFFERS)
+
+# Set whenever a receive buffer is returned to rx_pool
+rx_released = asyncio.Event()
+
+# Cache structure: {question_key: (response, expiration_time)}
 dns_cache = {}
 
+# Query counters reported by the management interface
+stats = {
+    "queries": 0,
+    "blocked": 0,
+    "zone": 0,
+    "cache_hits": 0,
+    "custom": 0,
+    "upstream": 0,
+    "failed": 0,
+}
+
+
+if hasattr(asyncio, "core"):
+    async def wait_readable(sock):
+        """
+        Suspend the current task until sock has data to read.
+
+        Args:
+            sock (socket): A non-blocking socket.
+        """
+        # uasyncio parks the task on its poller, as its own streams do
+        yield asyncio.core._io_queue.queue_read(sock)
+else:
+    async def wait_readable(sock):
+        """
+        Suspend the current task until sock has data to read.
+
+        Args:
+            sock (socket): A non-blocking socket.
+        """
+        loop = asyncio.get_event_loop()
+        ready = loop.create_future()
+        loop.add_reader(sock, lambda: ready.done() or ready.set_result(None))
+        try:
+            await ready
+        finally:
+            loop.remove_reader(sock)
+
 
 def load_cache():
     """
@@ -25,8 +88,8 @@ def load_cache():
         with open(CACHE_FILE, "r") as file:
             raw_cache = json.load(file)
             dns_cache = {
-                domain: (response, time.time() + ttl)
-                for domain, (response, ttl) in raw_cache.items()
+                binascii.unhexlify(key): (binascii.unhexlify(response), time.time() + ttl)
+                for key, (response, ttl) in raw_cache.items()
             }
         print(f"Cache loaded with {len(dns_cache)} entries.")
     except FileNotFoundError:
@@ -42,8 +105,11 @@ def save_cache():
     try:
         with open(CACHE_FILE, "w") as file:
             raw_cache = {
-                domain: (response, max(0, expiration_time - time.time()))
-                for domain, (response, expiration_time) in dns_cache.items()
+                binascii.hexlify(key).decode(): (
+                    binascii.hexlify(response).decode(),
+                    max(0, expiration_time - time.time()),
+                )
+                for key, (response, expiration_time) in dns_cache.items()
                 if expiration_time > time.time()
             }
             json.dump(raw_cache, file)
@@ -52,121 +118,313 @@ def save_cache():
         print(f"Error saving cache: {e}")
 
 
-def get_from_cache(domain):
+def get_from_cache(key):
     """
     Retrieve a cached DNS response if it exists and is not expired.
 
     Args:
-        domain (str): The domain name to look up in the cache.
+        key (bytes): The cache key, the query's "question_key".
 
     Returns:
         bytes: Cached DNS response or None if not found or expired.
     """
-    if domain in dns_cache:
-        response, expiration_time = dns_cache[domain]
+    if key in dns_cache:
+        response, expiration_time = dns_cache[key]
         if time.time() < expiration_time:
-            print(f"Cache hit for {domain}")
+            if LOG_QUERIES:
+                print(f"Cache hit for {key_to_name(key)}")
             return response
         else:
-            print(f"Cache expired for {domain}")
-            del dns_cache[domain]  # Remove expired entry
+            if LOG_QUERIES:
+                print(f"Cache expired for {key_to_name(key)}")
+            del dns_cache[key]  # Remove expired entry
     return None
 
 
-def add_to_cache(domain, response, ttl=CACHE_TTL):
+def flush_cache():
+    """
+    Remove all entries from the DNS cache.
+
+    Returns:
+        int: Number of entries removed.
+    """
+    count = len(dns_cache)
+    dns_cache.clear()
+    print(f"Flushed {count} cache entries.")
+    return count
+
+
+def iter_cache():
+    """
+    Iterate over a snapshot of the live cache entries.
+
+    Names are decoded as the iterator is consumed, so a caller can stream a
+    large cache while other tasks modify it.
+
+    Yields:
+        tuple: (domain name, seconds until expiry)
+    """
+    now = time.time()
+    for key, (response, expiration_time) in list(dns_cache.items()):
+        if expiration_time > now:
+            yield key_to_name(key), int(expiration_time - now)
+
+
+def list_cache():
+    """
+    List the live cache entries.
+
+    Returns:
+        dict: {domain name: seconds until expiry}
+    """
+    return dict(iter_cache())
+
+
+def add_to_cache(key, response, ttl=CACHE_TTL):
     """
     Add a DNS response to the cache.
 
     Args:
-        domain (str): The domain name to cache.
+        key (bytes): The cache key, the query's "question_key".
         response (bytes): The DNS response packet.
         ttl (int): Time-to-live in seconds for the cache entry.
     """
     expiration_time = time.time() + ttl
-    dns_cache[domain] = (response, expiration_time)
-    print(f"Added {domain} to cache with TTL {ttl} seconds.")
+    dns_cache[key] = (response, expiration_time)
+    if LOG_QUERIES:
+        print(f"Added {key_to_name(key)} to cache with TTL {ttl} seconds.")
 
 
-async def forward_to_upstream(query):
+def receive_into(sock, buf):
+    """
+    Receive a datagram into a preallocated buffer.
+
+    Uses recvfrom_into() where the socket supports it. MicroPython sockets only
+    provide recvfrom(), in which case the datagram is copied into buf so the
+    rest of the pipeline still works on the pooled buffer.
+
+    Args:
+        sock (socket): The socket to read from.
+        buf (bytearray): The buffer to fill.
+
+    Returns:
+        tuple: (number of bytes received, sender address).
+    """
+    if hasattr(sock, "recvfrom_into"):
+        return sock.recvfrom_into(buf)
+    data, addr = sock.recvfrom(len(buf))
+    nbytes = len(data)
+    buf[:nbytes] = data
+    return nbytes, addr
+
+
+def restore_question_case(buf, query):
+    """
+    Copy the client's question name into a response so its original case is echoed back.
+
+    Args:
+        buf (bytearray): The response packet.
+        query (dict): Parsed DNS query fields of the client's query.
+    """
+    name_end = query["question_end"] - 4
+    buf[DNS_HEADER_SIZE:name_end] = memoryview(query["packet"])[DNS_HEADER_SIZE:name_end]
+
+
+def copy_cached_response(cached, query, buf):
+    """
+    Copy a cached response into a transmit buffer for the current query.
+
+    The client's transaction ID and question case are stamped over the cached ones.
+
+    Args:
+        cached (bytes): The cached DNS response packet.
+        query (dict): Parsed DNS query fields.
+        buf (bytearray): The transmit buffer.
+
+    Returns:
+        memoryview: The response packet as a view into buf.
+    """
+    nbytes = len(cached)
+    if nbytes > len(buf):
+        buf = bytearray(cached)
+    else:
+        buf[:nbytes] = cached
+    struct.pack_into("!H", buf, 0, query["transaction_id"])
+    restore_question_case(buf, query)
+    return memoryview(buf)[:nbytes]
+
+
+async def forward_to_upstream(query, buf=None):
     """
     Forward the DNS query to the upstream DNS server.
 
     Args:
-        query (bytes): The raw DNS query packet.
+        query (bytes | memoryview): The raw DNS query packet.
+        buf (bytearray): Optional buffer to receive the upstream response into.
 
     Returns:
-        bytes: The raw DNS response packet from the upstream server.
+        bytes | memoryview: The raw DNS response packet from the upstream server.
     """
+    sock = None
     try:
         sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        sock.settimeout(2)
+        sock.setblocking(False)
         sock.sendto(query, (UPSTREAM_DNS, 53))
-        response, _ = sock.recvfrom(512)
-        return response
-    except socket.timeout:
+        await asyncio.wait_for(wait_readable(sock), UPSTREAM_TIMEOUT)
+        if buf is None:
+            response, _ = sock.recvfrom(512)
+            return response
+        nbytes, _ = receive_into(sock, buf)
+        return memoryview(buf)[:nbytes]
+    except asyncio.TimeoutError:
         print("Upstream DNS server timed out.")
         return None
     except Exception as e:
         print(f"Error forwarding to upstream DNS: {e}")
         return None
     finally:
-        sock.close()
+        if sock:
+            sock.close()
+
+
+async def resolve_upstream(query, length, buf):
+    """
+    Resolve a query upstream using DNS 0x20 case randomization.
+
+    The query is copied into buf with the letters of its name randomly cased.
+    Replies that do not echo that exact name are treated as spoofed and dropped.
+    Accepted replies get the client's original case restored in the question.
+
+    Args:
+        query (dict): Parsed DNS query fields.
+        length (int): Length of the client's query packet.
+        buf (bytearray): The transmit buffer, also used to receive the reply.
+
+    Returns:
+        memoryview: The upstream response as a view into buf, or None.
+    """
+    name_end = query["question_end"] - 4
+    buf[:length] = memoryview(query["packet"])[:length]
+    randomize_case(buf, DNS_HEADER_SIZE, name_end)
+    sent_name = bytes(buf[DNS_HEADER_SIZE:name_end])
+
+    response = await forward_to_upstream(memoryview(buf)[:length], buf)
+    if not response:
+        return None
+    if len(response) < name_end or bytes(response[DNS_HEADER_SIZE:name_end]) != sent_name:
+        print(f"Discarded upstream response for {query_domain(query)}: question name mismatch")
+        return None
 
+    restore_question_case(buf, query)
+    return response
 
-async def handle_request(data, addr, sock):
+
+async def handle_request(data, addr, sock, length=None):
     """
     Handle a single DNS request.
 
+    Responses are built in a pooled transmit buffer; only entries stored in the
+    cache are copied out of it.
+
     Args:
-        data (bytes): The raw DNS query data.
+        data (bytes | bytearray): The raw DNS query data, possibly a pooled buffer.
         addr (tuple): The client address.
         sock (socket): The server socket.
+        length (int): Number of valid bytes in data (default: len(data)).
     """
-    query = parse_dns_query(data)
+    if length is None:
+        length = len(data)
+    query = parse_dns_query(data, length)
     if not query:
         print("Failed to parse query.")
         return
 
-    domain = query["domain"]
-    print(f"Received query for {domain} from {addr}")
+    key = query["question_key"]
+    stats["queries"] += 1
+    if LOG_QUERIES:
+        print(f"Received query for {query_domain(query)} from {addr}")
 
-    # Check if the domain is blocked
-    if is_blocked(domain):
-        response = create_dns_response(query, "0.0.0.0")
-        sock.sendto(response, addr)
-        print(f"Blocked {domain} and returned 0.0.0.0")
-        return
+    tx = tx_pool.acquire()
+    try:
+        # Check if the domain is blocked
+        if is_blocked(query["key"]):
+            response = create_dns_response(query, "0.0.0.0", buf=tx)
+            sock.sendto(response, addr)
+            stats["blocked"] += 1
+            if LOG_QUERIES:
+                print(f"Blocked {query_domain(query)} and returned 0.0.0.0")
+            return
 
-    # Check the cache
-    cached_response = get_from_cache(domain)
-    if cached_response:
-        sock.sendto(cached_response, addr)
-        return
+        # Answer authoritatively from a local zone
+        response = resolve_zone(query, tx)
+        if response:
+            sock.sendto(response, addr)
+            stats["zone"] += 1
+            if LOG_QUERIES:
+                print(f"Answered {query_domain(query)} from local zone")
+            return
 
-    # Check for a custom domain resolution
-    ip = resolve_custom_domain(domain)
-    if ip:
-        response = create_dns_response(query, ip)
-        sock.sendto(response, addr)
-        add_to_cache(domain, response)
-        print(f"Resolved {domain} to {ip} and cached it")
-        return
+        # Check the cache
+        cached_response = get_from_cache(key)
+        if cached_response:
+            sock.sendto(copy_cached_response(cached_response, query, tx), addr)
+            stats["cache_hits"] += 1
+            return
 
-    # Forward to the upstream DNS server
-    upstream_response = await forward_to_upstream(data)
-    if upstream_response:
-        sock.sendto(upstream_response, addr)
-        add_to_cache(domain, upstream_response)
-        print(f"Forwarded {domain} to upstream DNS and cached it")
-    else:
-        print(f"Failed to resolve {domain} via upstream DNS")
+        # Check for a custom domain resolution
+        ip = resolve_custom_domain(query["key"])
+        if ip:
+            response = create_dns_response(query, ip, buf=tx)
+            sock.sendto(response, addr)
+            add_to_cache(key, bytes(response))
+            stats["custom"] += 1
+            if LOG_QUERIES:
+                print(f"Resolved {query_domain(query)} to {ip} and cached it")
+            return
+
+        # Forward to the upstream DNS server
+        upstream_response = await resolve_upstream(query, length, tx)
+        if upstream_response:
+            sock.sendto(upstream_response, addr)
+            add_to_cache(key, bytes(upstream_response))
+            stats["upstream"] += 1
+            if LOG_QUERIES:
+                print(f"Forwarded {query_domain(query)} to upstream DNS and cached it")
+        else:
+            stats["failed"] += 1
+            print(f"Failed to resolve {query_domain(query)} via upstream DNS")
+    finally:
+        tx_pool.release(tx)
+
+
+async def handle_pooled_request(buf, nbytes, addr, sock):
+    """
+    Handle a request received into a pooled buffer and return the buffer afterwards.
+
+    Args:
+        buf (bytearray): The pooled receive buffer.
+        nbytes (int): Number of valid bytes in buf.
+        addr (tuple): The client address.
+        sock (socket): The server socket.
+    """
+    try:
+        await handle_request(buf, addr, sock, nbytes)
+    finally:
+        rx_pool.release(buf)
+        rx_released.set()
 
 
 async def start_dns_server():
     """
     Start the DNS server to listen for queries on UDP port 53.
+
+    The socket is non-blocking and the loop waits on the event loop's poller,
+    so other tasks keep running between queries. At most RX_BUFFERS queries are
+    handled at once; while every receive buffer is in use, new datagrams stay
+    in the socket queue until a handler finishes.
     """
     sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.setblocking(False)
     sock.bind(("0.0.0.0", 53))
     print("DNS server is running on port 53...")
 
@@ -174,8 +432,19 @@ async def start_dns_server():
 
     try:
         while True:
-            data, addr = sock.recvfrom(512)
-            asyncio.create_task(handle_request(data, addr, sock))
+            while not rx_pool.available():
+                rx_released.clear()
+                await rx_released.wait()
+            await wait_readable(sock)
+            buf = rx_pool.acquire()
+            try:
+                nbytes, addr = receive_into(sock, buf)
+            except OSError as e:
+                rx_pool.release(buf)
+                if e.errno != errno.EAGAIN:
+                    print(f"Error receiving DNS query: {e}")
+                continue
+            asyncio.create_task(handle_pooled_request(buf, nbytes, addr, sock))
     except KeyboardInterrupt:
         print("Shutting down DNS server.")
     finally:
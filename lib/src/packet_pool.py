@@ -0,0 +1,54 @@
+from dns_parser import MAX_PACKET_SIZE
+
+
+class PacketBufferPool:
+    """
+    A fixed pool of preallocated packet buffers.
+
+    Buffers are allocated once at startup and recycled between queries, so the
+    hot path does not allocate a new packet for every request.
+    """
+
+    def __init__(self, count=8, size=MAX_PACKET_SIZE):
+        """
+        Args:
+            count (int): Number of buffers to preallocate.
+            size (int): Size of each buffer in bytes.
+        """
+        self.size = size
+        self.capacity = count
+        self.misses = 0
+        self._free = [bytearray(size) for _ in range(count)]
+
+    def acquire(self):
+        """
+        Take a buffer from the pool.
+
+        If the pool is exhausted a fresh buffer is allocated and counted as a miss.
+        Such a buffer is not kept when it is released, so callers that must stay
+        allocation-free should check available() first and wait instead.
+
+        Returns:
+            bytearray: A buffer of the pool's size.
+        """
+        if self._free:
+            return self._free.pop()
+        self.misses += 1
+        return bytearray(self.size)
+
+    def release(self, buf):
+        """
+        Return a buffer to the pool.
+
+        Args:
+            buf (bytearray): A buffer previously returned by acquire().
+        """
+        if len(self._free) < self.capacity and len(buf) == self.size:
+            self._free.append(buf)
+
+    def available(self):
+        """
+        Returns:
+            int: Number of buffers currently free in the pool.
+        """
+        return len(self._free)
@@ -0,0 +1,490 @@
+import struct
+from dns_parser import MAX_PACKET_SIZE, encode_name, name_to_key, find_suffix, create_raw_response
+
+TYPE_A = 1
+TYPE_NS = 2
+TYPE_CNAME = 5
+TYPE_SOA = 6
+TYPE_PTR = 12
+TYPE_MX = 15
+TYPE_TXT = 16
+TYPE_AAAA = 28
+TYPE_ANY = 255
+CLASS_IN = 1
+
+RECORD_TYPES = {
+    "A": TYPE_A,
+    "NS": TYPE_NS,
+    "CNAME": TYPE_CNAME,
+    "SOA": TYPE_SOA,
+    "PTR": TYPE_PTR,
+    "MX": TYPE_MX,
+    "TXT": TYPE_TXT,
+    "AAAA": TYPE_AAAA,
+}
+
+DEFAULT_TTL = 3600  # Used when a zone file has no $TTL directive
+TTL_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+WILDCARD_LABEL = b"\x01*"
+
+
+def parse_ttl(text):
+    """
+    Parse a TTL value, accepting BIND-style units (e.g. "1h30m").
+
+    Args:
+        text (str): The TTL as written in the zone file.
+
+    Returns:
+        int: The TTL in seconds.
+    """
+    if text.isdigit():
+        return int(text)
+    total = 0
+    number = ""
+    for c in text.lower():
+        if c.isdigit():
+            number += c
+        elif c in TTL_UNITS and number:
+            total += int(number) * TTL_UNITS[c]
+            number = ""
+        else:
+            raise ValueError(f"invalid TTL {text}")
+    if number:
+        raise ValueError(f"invalid TTL {text}")
+    return total
+
+
+def parse_ipv6(text):
+    """
+    Parse an IPv6 address into its 16-byte wire format.
+
+    Args:
+        text (str): The address, e.g. "fd00::1".
+
+    Returns:
+        bytes: The packed address.
+    """
+    if "::" in text:
+        head, tail = text.split("::", 1)
+        head = head.split(":") if head else []
+        tail = tail.split(":") if tail else []
+        missing = 8 - len(head) - len(tail)
+        if missing < 1:
+            raise ValueError(f"invalid IPv6 address {text}")
+        groups = head + ["0"] * missing + tail
+    else:
+        groups = text.split(":")
+    if len(groups) != 8 or not all(0 < len(group) <= 4 for group in groups):
+        raise ValueError(f"invalid IPv6 address {text}")
+    return struct.pack("!8H", *[int(group, 16) for group in groups])
+
+
+def parse_ipv4(text):
+    """
+    Parse an IPv4 address into its 4-byte wire format.
+
+    Args:
+        text (str): The address, e.g. "192.168.1.10".
+
+    Returns:
+        bytes: The packed address.
+    """
+    octets = text.split(".")
+    if len(octets) != 4 or not all(octet.isdigit() and int(octet) < 256 for octet in octets):
+        raise ValueError(f"invalid IPv4 address {text}")
+    return bytes([int(octet) for octet in octets])
+
+
+def qualify(name, origin):
+    """
+    Make a zone file name absolute.
+
+    Args:
+        name (str): The name as written ("@", relative, or ending in ".").
+        origin (str): The current $ORIGIN, without a trailing dot.
+
+    Returns:
+        str: The absolute name without a trailing dot.
+    """
+    if name == "@":
+        return origin
+    if name.endswith("."):
+        return name[:-1]
+    if origin:
+        return name + "." + origin
+    return name
+
+
+def _logical_lines(lines):
+    """
+    Split zone file text into logical lines of tokens.
+
+    Comments are dropped, parenthesised records are joined across lines and
+    quoted strings are kept as single tokens (including their quotes).
+
+    Yields:
+        tuple: (line number, tokens, whether the line starts with blank space).
+    """
+    depth = 0
+    tokens = []
+    start = 0
+    blank_owner = False
+    for number, line in enumerate(lines, 1):
+        if depth == 0:
+            tokens = []
+            start = number
+            blank_owner = line[:1] in (" ", "\t")
+        i = 0
+        length = len(line)
+        while i < length:
+            c = line[i]
+            if c == ";":
+                break
+            if c in " \t\r\n":
+                i += 1
+            elif c == "(":
+                depth += 1
+                i += 1
+            elif c == ")":
+                depth -= 1
+                if depth < 0:
+                    raise ValueError(f"line {number}: unbalanced parentheses")
+                i += 1
+            elif c == '"':
+                end = line.find('"', i + 1)
+                if end < 0:
+                    raise ValueError(f"line {number}: unterminated string")
+                tokens.append(line[i:end + 1])
+                i = end + 1
+            else:
+                end = i
+                while end < length and line[end] not in ' \t\r\n;()"':
+                    end += 1
+                tokens.append(line[i:end])
+                i = end
+        if depth == 0 and tokens:
+            yield start, tokens, blank_owner
+    if depth:
+        raise ValueError(f"line {start}: unbalanced parentheses")
+
+
+def _encode_rdata(rtype, fields, origin):
+    """
+    Encode the RDATA fields of a record in wire format.
+
+    Args:
+        rtype (str): The record type mnemonic.
+        fields (list): The RDATA tokens.
+        origin (str): The current $ORIGIN for relative names.
+
+    Returns:
+        bytes: The encoded RDATA.
+    """
+    if rtype == "TXT":
+        rdata = bytearray()
+        for field in fields:
+            text = field[1:-1] if field.startswith('"') else field
+            encoded = text.encode()
+            if len(encoded) > 255:
+                raise ValueError("TXT string longer than 255 bytes")
+            rdata.append(len(encoded))
+            rdata.extend(encoded)
+        if not rdata:
+            raise ValueError("TXT record without data")
+        return bytes(rdata)
+
+    expected = {"SOA": 7, "MX": 2}.get(rtype, 1)
+    if len(fields) != expected:
+        raise ValueError(f"{rtype} record expects {expected} field(s), got {len(fields)}")
+
+    if rtype == "A":
+        return parse_ipv4(fields[0])
+    if rtype == "AAAA":
+        return parse_ipv6(fields[0])
+    if rtype == "MX":
+        return struct.pack("!H", int(fields[0])) + encode_name(qualify(fields[1], origin))
+    if rtype == "SOA":
+        timers = [int(fields[2])] + [parse_ttl(field) for field in fields[3:]]
+        return (
+            encode_name(qualify(fields[0], origin))
+            + encode_name(qualify(fields[1], origin))
+            + struct.pack("!IIIII", *timers)
+        )
+    # NS, CNAME and PTR carry a single domain name
+    return encode_name(qualify(fields[0], origin))
+
+
+def parse_zone(lines, origin="", ttl=DEFAULT_TTL):
+    """
+    Parse RFC 1035 master file text into records.
+
+    Supports $ORIGIN and $TTL, "@", relative names, blank owners, optional
+    TTL/class fields in either order and multi-line parenthesised records.
+    Only class IN and the types in RECORD_TYPES are accepted. Files without an
+    initial origin or $ORIGIN take the owner of their first record, normally the
+    SOA, as the origin.
+
+    Args:
+        lines (iterable): Lines of the zone file.
+        origin (str): Initial origin (default: the first record's owner).
+        ttl (int): Default TTL until a $TTL directive is seen.
+
+    Yields:
+        tuple: (owner name, record type, TTL, RDATA bytes).
+    """
+    origin = origin.rstrip(".")
+    owner = None
+    for number, tokens, blank_owner in _logical_lines(lines):
+        try:
+            directive = tokens[0].upper()
+            if directive == "$ORIGIN":
+                origin = qualify(tokens[1], origin)
+                continue
+            if directive == "$TTL":
+                ttl = parse_ttl(tokens[1])
+                continue
+            if directive.startswith("$"):
+                raise ValueError(f"unsupported directive {tokens[0]}")
+
+            if not blank_owner:
+                owner = qualify(tokens.pop(0), origin)
+            elif owner is None:
+                raise ValueError("record without an owner name")
+            if not origin:
+                origin = owner
+
+            record_ttl = ttl
+            while tokens:
+                field = tokens[0].upper()
+                if field == "IN":
+                    tokens.pop(0)
+                elif field in ("CH", "HS", "CS"):
+                    raise ValueError("only class IN is supported")
+                elif field[:1].isdigit():
+                    record_ttl = parse_ttl(tokens.pop(0).lower())
+                else:
+                    break
+
+            rtype = tokens.pop(0).upper()
+            if rtype not in RECORD_TYPES:
+                raise ValueError(f"unsupported record type {rtype}")
+            rdata = _encode_rdata(rtype, tokens, origin)
+        except (ValueError, IndexError) as e:
+            raise ValueError(f"line {number}: {e}")
+        yield owner, RECORD_TYPES[rtype], record_ttl, rdata
+
+
+def soa_serial(rdata):
+    """
+    Args:
+        rdata (bytes): SOA RDATA in wire format.
+
+    Returns:
+        int: The zone serial number.
+    """
+    return struct.unpack_from("!I", rdata, len(rdata) - 20)[0]
+
+
+def reverse_name(address):
+    """
+    Build the reverse-lookup name and reverse zone origin for an address.
+
+    IPv4 addresses are grouped into /24 in-addr.arpa zones and IPv6 addresses
+    into /64 ip6.arpa zones.
+
+    Args:
+        address (bytes): A packed IPv4 or IPv6 address.
+
+    Returns:
+        tuple: (PTR owner name, reverse zone origin).
+    """
+    if len(address) == 4:
+        labels = [str(octet) for octet in reversed(address)]
+        suffix = "in-addr.arpa"
+        zone_labels = 3
+    else:
+        labels = []
+        for octet in reversed(address):
+            labels.append("%x" % (octet & 0xF))
+            labels.append("%x" % (octet >> 4))
+        suffix = "ip6.arpa"
+        zone_labels = 16
+    name = ".".join(labels) + "." + suffix
+    origin = ".".join(labels[len(labels) - zone_labels:]) + "." + suffix
+    return name, origin
+
+
+class Zone:
+    """
+    A compiled authoritative zone.
+
+    Records are indexed by lowercase wire-format owner name and every RRset is
+    encoded ahead of time, so answering a query is a dictionary lookup plus a
+    copy into the transmit buffer.
+    """
+
+    def __init__(self, origin, records, partial=False):
+        """
+        Args:
+            origin (str): The zone apex, without a trailing dot.
+            records (iterable): (owner, type, TTL, RDATA) tuples, including the apex SOA.
+            partial (bool): Only answer for names that own records and leave the
+                rest of the zone to other resolvers, as for generated reverse zones.
+        """
+        self.origin = origin
+        self.partial = partial
+        self.key = name_to_key(origin)
+        self.records = []
+        self.soa = None
+        rrsets = {}
+        for owner, rtype, ttl, rdata in records:
+            owner_key = name_to_key(owner)
+            if find_suffix(owner_key, (self.key,)) is None:
+                raise ValueError(f"{owner} is outside zone {origin}")
+            if rtype == TYPE_SOA:
+                if owner_key != self.key:
+                    raise ValueError(f"SOA record for {owner} is not at the zone apex")
+                if self.soa is None:
+                    self.soa = (ttl, rdata)
+                continue
+            self.records.append((owner, rtype, ttl, rdata))
+            rrset = rrsets.setdefault(owner_key, {}).setdefault(rtype, [ttl, []])
+            rrset[0] = min(rrset[0], ttl)
+            if rdata not in rrset[1]:
+                rrset[1].append(rdata)
+        if self.soa is None:
+            raise ValueError(f"zone {origin} has no SOA record")
+        self.owners = set(rrsets)
+        rrsets.setdefault(self.key, {})[TYPE_SOA] = [self.soa[0], [self.soa[1]]]
+        self.serial = soa_serial(self.soa[1])
+        self._compile(rrsets)
+
+    def _compile(self, rrsets):
+        """
+        Precompute answer sections, the name index and the negative-answer SOA.
+        """
+        self.answers = {}
+        self.names = set()
+        self.wildcards = {}
+        for owner_key, types in rrsets.items():
+            everything = []
+            for rtype, (ttl, rdatas) in types.items():
+                encoded = [
+                    struct.pack("!HHHIH", 0xC00C, rtype, CLASS_IN, ttl, len(rdata)) + rdata
+                    for rdata in rdatas
+                ]
+                everything.extend(encoded)
+                self.answers[owner_key + struct.pack("!H", rtype)] = (len(encoded), b"".join(encoded))
+            self.answers[owner_key + struct.pack("!H", TYPE_ANY)] = (len(everything), b"".join(everything))
+
+            if owner_key.startswith(WILDCARD_LABEL):
+                self.wildcards[owner_key[2:]] = owner_key
+            # Register the owner and its empty non-terminals up to the apex
+            offset = 0
+            while owner_key[offset:] != self.key:
+                self.names.add(owner_key[offset:])
+                offset += 1 + owner_key[offset]
+        self.names.add(self.key)
+
+        # Negative answers carry the SOA with its TTL capped at the minimum field (RFC 2308)
+        ttl, rdata = self.soa
+        ttl = min(ttl, struct.unpack_from("!I", rdata, len(rdata) - 4)[0])
+        self.negative_soa = struct.pack("!HHIH", TYPE_SOA, CLASS_IN, ttl, len(rdata)) + rdata
+
+    def covers(self, key):
+        """
+        Args:
+            key (bytes): The lowercase wire-format query name.
+
+        Returns:
+            bool: True if this zone answers for the name.
+        """
+        return not self.partial or key in self.owners
+
+    def lookup(self, key, qtype):
+        """
+        Look up the precomputed answer for a name in this zone.
+
+        Args:
+            key (bytes): The lowercase wire-format query name.
+            qtype (int): The query type.
+
+        Returns:
+            tuple: (rcode, answer count, encoded answer section).
+        """
+        name = key
+        if key not in self.names:
+            # Only the wildcard at the closest encloser applies (RFC 4592); the
+            # apex is always in self.names, so this stops inside the zone
+            offset = 1 + key[0]
+            while key[offset:] not in self.names:
+                offset += 1 + key[offset]
+            name = self.wildcards.get(key[offset:])
+            if name is None:
+                return 3, 0, b""  # NXDOMAIN
+
+        answer = self.answers.get(name + struct.pack("!H", qtype))
+        if answer is None and qtype != TYPE_CNAME:
+            answer = self.answers.get(name + struct.pack("!H", TYPE_CNAME))
+        if answer is None:
+            return 0, 0, b""  # NODATA
+        return 0, answer[0], answer[1]
+
+    def address_records(self):
+        """
+        Yields:
+            tuple: (owner name, TTL, packed address) for every A and AAAA record.
+        """
+        for owner, rtype, ttl, rdata in self.records:
+            if rtype in (TYPE_A, TYPE_AAAA) and not owner.startswith("*."):
+                yield owner, ttl, rdata
+
+
+def reverse_records(zone):
+    """
+    Generate PTR records for the A and AAAA records of a forward zone.
+
+    Args:
+        zone (Zone): The forward zone.
+
+    Returns:
+        dict: {reverse zone origin: [(owner, type, TTL, RDATA), ...]}
+    """
+    reverse = {}
+    for owner, ttl, address in zone.address_records():
+        name, origin = reverse_name(address)
+        reverse.setdefault(origin, []).append((name, TYPE_PTR, ttl, encode_name(owner)))
+    return reverse
+
+
+def create_zone_response(query, zone, buf=None):
+    """
+    Create an authoritative response for a query that falls inside a zone.
+
+    Args:
+        query (dict): Parsed DNS query fields.
+        zone (Zone): The zone containing the query name.
+        buf (bytearray): Optional transmit buffer to build the response in.
+
+    Answers that do not fit in the buffer are replaced by an empty response
+    with the TC bit set, so the client retries over another transport instead
+    of the query leaking upstream.
+
+    Returns:
+        bytes | memoryview: DNS response packet, or a view into buf when given.
+    """
+    key = query["key"]
+    rcode, ancount, answers = zone.lookup(key, query["type"])
+    # Authoritative answer; echo RD and advertise recursion for everything else
+    flags = 0x8480 | (query["flags"] & 0x0100) | rcode
+    if ancount:
+        size = len(buf) if buf is not None else MAX_PACKET_SIZE
+        if query["question_end"] + len(answers) > size:
+            return create_raw_response(query, flags | 0x0200, 0, b"", buf=buf)
+        return create_raw_response(query, flags, ancount, answers, buf=buf)
+
+    # NXDOMAIN/NODATA: SOA in the authority section, owner compressed onto the question name
+    apex_offset = 12 + len(key) - len(zone.key)
+    authority = struct.pack("!H", 0xC000 | apex_offset) + zone.negative_soa
+    return create_raw_response(query, flags, 0, b"", 1, authority, buf=buf)
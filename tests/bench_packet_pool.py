@@ -0,0 +1,107 @@
+"""
+Compare per-query heap usage of the allocating and pooled DNS reply paths.
+
+Run on the Pico W with `mpremote run tests/bench_packet_pool.py` (with lib/ on
+the device) or on the desktop with `python tests/bench_packet_pool.py` from the
+repository root.
+
+For each path the benchmark reports:
+  - heap bytes allocated per query (MicroPython: gc.mem_alloc() delta with the
+    collector disabled; CPython, which frees eagerly, only reports the
+    tracemalloc peak),
+  - the time of the collection that reclaims the garbage left behind, which is
+    the GC pause the query path would eventually trigger,
+  - the free heap after collection versus before the run, as a fragmentation hint.
+"""
+import gc
+import sys
+import time
+sys.path.append('lib/src')
+
+from dns_parser import parse_dns_query, create_dns_response
+from packet_pool import PacketBufferPool
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+ITERATIONS = 1000
+RAW_QUERY = b'\x12\x34\x01\x00\x00\x01\x00\x00\x00\x00\x00\x00\x07example\x03com\x00\x00\x01\x00\x01'
+
+
+def _ticks_us():
+    if hasattr(time, "ticks_us"):
+        return time.ticks_us()
+    return time.perf_counter_ns() // 1000
+
+
+def _ticks_diff(end, start):
+    if hasattr(time, "ticks_diff"):
+        return time.ticks_diff(end, start)
+    return end - start
+
+
+def allocating_path():
+    """Mimic the original path: a fresh bytes per datagram and per reply."""
+    data = bytes(RAW_QUERY)
+    query = parse_dns_query(data)
+    return create_dns_response(query, "192.168.1.100")
+
+
+def make_pooled_path():
+    rx_pool = PacketBufferPool(1)
+    tx_pool = PacketBufferPool(1)
+    nbytes = len(RAW_QUERY)
+
+    def pooled_path():
+        rx = rx_pool.acquire()
+        tx = tx_pool.acquire()
+        rx[:nbytes] = RAW_QUERY
+        query = parse_dns_query(rx, nbytes)
+        response = create_dns_response(query, "192.168.1.100", buf=tx)
+        tx_pool.release(tx)
+        rx_pool.release(rx)
+        return response
+
+    return pooled_path
+
+
+def measure(name, fn):
+    gc.collect()
+    start_free = gc.mem_free() if hasattr(gc, "mem_free") else None
+
+    if hasattr(gc, "mem_alloc"):
+        gc.disable()
+        before = gc.mem_alloc()
+        for _ in range(ITERATIONS):
+            fn()
+        allocated = gc.mem_alloc() - before
+        gc.enable()
+        usage = f"heap allocated per query: {allocated / ITERATIONS:.1f} bytes"
+    else:
+        tracemalloc.start()
+        for _ in range(ITERATIONS):
+            fn()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        usage = f"peak traced heap: {peak} bytes"
+
+    start = _ticks_us()
+    gc.collect()
+    pause = _ticks_diff(_ticks_us(), start)
+
+    print(f"{name}:")
+    print(f"  {usage}")
+    print(f"  GC pause reclaiming {ITERATIONS} queries: {pause} us")
+    if start_free is not None:
+        print(f"  free heap after collect: {gc.mem_free()} bytes (before: {start_free})")
+
+
+def main():
+    measure("allocating path", allocating_path)
+    measure("pooled path", make_pooled_path())
+
+
+if __name__ == "__main__":
+    main()
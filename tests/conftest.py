@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The modules under lib/src import each other by bare name, as they do on the device
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "lib", "src"))
@@ -18,6 +18,11 @@ def test_blocklist():
     assert is_blocked("sub.example.com") is True
     assert is_blocked("nonexistent.com") is False
 
+    # Test case-insensitive and label-boundary matching
+    assert is_blocked("ADS.Google.com") is True
+    assert is_blocked(b"\x03sub\x07example\x03com\x00") is True
+    assert is_blocked("badexample.com") is False
+
     # Test listing blocklist
     blocked = list_blocked_domains()
     assert "ads.google.com" in blocked
@@ -29,6 +34,13 @@ def test_blocklist():
     load_blocklist(test_file)
     assert is_blocked("ads.google.com") is True
 
+    # Test that an invalid entry is skipped without dropping the rest of the file
+    with open(test_file, "w") as f:
+        f.write("a.com\n" + "x" * 70 + ".com\nb.com\n")
+    load_blocklist(test_file)
+    assert is_blocked("a.com") is True
+    assert is_blocked("b.com") is True
+
     print("Blocklist tests passed.")
 
 if __name__ == "__main__":
@@ -0,0 +1,99 @@
+import asyncio
+
+# Imported by bare name so the tests share module state with control_server
+from control_server import ControlServer
+from blocklist import is_blocked
+from custom_resolver import resolve_custom_domain
+import dns_server
+
+class FakeWriter:
+    def __init__(self):
+        self.data = b""
+
+    def write(self, data):
+        self.data += data
+
+    async def drain(self):
+        await asyncio.sleep(0)
+
+async def run_command(server, line):
+    writer = FakeWriter()
+    await server.execute(line.split(), writer)
+    return writer.data.decode().splitlines()
+
+async def run_control_server():
+    test_file = "test_import_blocklist.txt"
+    domains_file = "test_control_domains.json"
+    server = ControlServer(batch_size=100)
+
+    # Test basic commands and the reply protocol
+    assert await run_command(server, "block ads.control.test") == ["OK"]
+    assert is_blocked("ads.control.test") is True
+    assert await run_command(server, "block ads.control.test") == ["ERROR command failed"]
+    assert await run_command(server, "unblock ads.control.test") == ["OK"]
+    assert (await run_command(server, "bogus"))[-1].startswith("ERROR")
+    assert await run_command(server, "block " + "x" * 70 + ".test") == ["ERROR invalid domain"]
+
+    # Test stats and flush_cache
+    dns_server.add_to_cache(b"\x04test\x00\x00\x01\x00\x01", b"response")
+    stats = await run_command(server, "stats")
+    assert "cache_entries: 1" in stats and stats[-1] == "OK"
+    assert await run_command(server, "flush_cache") == ["Flushed 1 entries.", "OK"]
+    assert len(dns_server.dns_cache) == 0
+
+    # Test that a bulk import yields to other tasks between batches
+    with open(test_file, "w") as f:
+        for i in range(1000):
+            f.write(f"host{i}.import.test\n")
+    ticks = []
+
+    async def query_path():
+        while len(ticks) < 100:
+            ticks.append(1)
+            await asyncio.sleep(0)
+
+    task = asyncio.create_task(query_path())
+    reply = await run_command(server, f"import_blocklist {test_file}")
+    assert reply == ["Imported 1000 new entries.", "OK"]
+    assert len(ticks) >= 9
+    assert is_blocked("host999.import.test") is True
+    task.cancel()
+
+    # Test that listing survives the blocklist changing between drains
+    task = asyncio.create_task(run_command(server, "block late.import.test"))
+    reply = await run_command(server, "list_blocked")
+    await task
+    assert reply[-1] == "OK" and "host0.import.test" in reply
+
+    # Test that saving the blocklist yields to other tasks between batches
+    server.blocklist_file = "test_saved_blocklist.txt"
+    ticks.clear()
+    task = asyncio.create_task(query_path())
+    assert await run_command(server, "save_blocklist") == ["OK"]
+    assert len(ticks) >= 9
+    task.cancel()
+    with open(server.blocklist_file) as f:
+        assert "host999.import.test\n" in f.read()
+
+    # Test that a missing file is reported as an error
+    reply = await run_command(server, "import_blocklist test_missing_blocklist.txt")
+    assert reply == ["Imported 0 new entries.", "ERROR command failed"]
+
+    # Test that reload keeps domains blocked or added at runtime
+    with open(domains_file, "w") as f:
+        f.write("{}")
+    server = ControlServer(blocklist_file=test_file, domains_file=domains_file, batch_size=100)
+    assert await run_command(server, "block runtime.import.test") == ["OK"]
+    assert await run_command(server, "add runtime.domain.test 192.168.1.40") == ["OK"]
+    assert await run_command(server, "reload") == ["OK"]
+    assert is_blocked("runtime.import.test") is True
+    assert resolve_custom_domain("runtime.domain.test") == "192.168.1.40"
+    server.domains_file = "test_missing_domains.json"
+    assert await run_command(server, "reload") == ["ERROR command failed"]
+
+def test_control_server():
+    asyncio.run(run_control_server())
+    print("Control server tests passed.")
+
+if __name__ == "__main__":
+    test_control_server()
@@ -18,6 +18,10 @@ def test_custom_resolver():
     assert resolve_custom_domain("sub.example.com") == "192.168.1.200"
     assert resolve_custom_domain("nonexistent.com") is None
 
+    # Test case-insensitive lookups
+    assert resolve_custom_domain("Example.COM") == "192.168.1.100"
+    assert resolve_custom_domain("Sub.Example.com") == "192.168.1.200"
+
     # Test listing custom domains
     domains = list_custom_domains()
     assert "example.com" in domains
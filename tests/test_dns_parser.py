@@ -1,13 +1,25 @@
-from lib.src.dns_parser import parse_dns_query, create_dns_response, create_error_response
+from lib.src.dns_parser import (
+    parse_dns_query,
+    create_dns_response,
+    create_error_response,
+    create_cname_response,
+    name_to_key,
+    key_to_name,
+    find_suffix,
+    randomize_case,
+    query_domain,
+)
 
 def test_dns_parser():
     # Test parsing a DNS query
     raw_query = b'\x12\x34\x01\x00\x00\x01\x00\x00\x00\x00\x00\x00\x07example\x03com\x00\x00\x01\x00\x01'
     query = parse_dns_query(raw_query)
     assert query["transaction_id"] == 0x1234
-    assert query["domain"] == "example.com"
+    assert query_domain(query) == "example.com"
     assert query["type"] == 1  # A record
     assert query["class"] == 1  # IN class
+    assert query["key"] == b"\x07example\x03com\x00"
+    assert query["question_key"] == b"\x07example\x03com\x00\x00\x01\x00\x01"
 
     # Test creating a DNS response
     ip_address = "192.168.1.1"
@@ -20,6 +32,43 @@ def test_dns_parser():
     assert error_response is not None
     assert len(error_response) > 0
 
+    # Test parsing from a larger pooled buffer and building the reply in place
+    rx = bytearray(512)
+    rx[:len(raw_query)] = raw_query
+    query = parse_dns_query(rx, len(raw_query))
+    assert query_domain(query) == "example.com"
+    tx = bytearray(512)
+    pooled_response = create_dns_response(query, ip_address, buf=tx)
+    assert isinstance(pooled_response, memoryview)
+    assert bytes(pooled_response) == response
+    assert bytes(pooled_response[-4:]) == bytes([192, 168, 1, 1])
+
+    # Test that a name running past the received length is rejected
+    assert parse_dns_query(rx, len(raw_query) - 6) is None
+
+    # Test creating a CNAME response
+    cname_response = create_cname_response(query, "alias.example.net", buf=tx)
+    assert bytes(cname_response[-19:]) == b"\x05alias\x07example\x03net\x00"
+
+    # Test canonical wire-format keys
+    assert name_to_key("Example.COM.") == b"\x07example\x03com\x00"
+    assert key_to_name(b"\x07example\x03com\x00") == "example.com"
+    assert key_to_name(b"\x03\xffab\x03com\x00") == "\\255ab.com"
+    suffixes = {name_to_key("example.com")}
+    assert find_suffix(name_to_key("ads.example.com"), suffixes) == name_to_key("example.com")
+    assert find_suffix(name_to_key("badexample.com"), suffixes) is None
+
+    # Test 0x20 case randomization only changes letter case
+    name = bytearray(b"\x07example\x03com\x00")
+    randomize_case(name, 0, len(name))
+    assert bytes(name).lower() == b"\x07example\x03com\x00"
+
+    # Test that replies echo the client's original case
+    mixed_query = parse_dns_query(raw_query.replace(b"example", b"ExAmPlE"))
+    assert mixed_query["key"] == query["key"]
+    assert query_domain(mixed_query) == "ExAmPlE.com"
+    assert b"ExAmPlE" in create_error_response(mixed_query)
+
     print("DNS parser tests passed.")
 
 if __name__ == "__main__":
@@ -0,0 +1,66 @@
+import asyncio
+import struct
+
+# Imported by bare name so the stubs below are seen by handle_request
+import dns_server
+
+QUERY = b"\x12\x34\x01\x00\x00\x01\x00\x00\x00\x00\x00\x00\x08UpStream\x07ExAmPle\x03NeT\x00\x00\x01\x00\x01"
+
+class FakeSocket:
+    def __init__(self):
+        self.sent = []
+
+    def sendto(self, data, addr):
+        self.sent.append((bytes(data), addr))
+
+def make_upstream(swap_case=False):
+    # Answer by echoing the forwarded query as a reply, optionally with the name's case flipped
+    async def forward_to_upstream(query, buf=None):
+        forwarded = bytearray(query)
+        struct.pack_into("!H", forwarded, 2, 0x8180)
+        if swap_case:
+            forwarded[12:-4] = bytes(forwarded[12:-4]).swapcase()
+        buf[:len(forwarded)] = forwarded
+        return memoryview(buf)[:len(forwarded)]
+    return forward_to_upstream
+
+async def run_dns_server():
+    addr = ("192.168.1.50", 5353)
+    original = dns_server.forward_to_upstream
+    try:
+        # Test that a reply echoing a different 0x20 name is dropped
+        dns_server.forward_to_upstream = make_upstream(swap_case=True)
+        sock = FakeSocket()
+        failed = dns_server.stats["failed"]
+        await dns_server.handle_request(QUERY, addr, sock)
+        assert sock.sent == []
+        assert dns_server.stats["failed"] == failed + 1
+        assert len(dns_server.dns_cache) == 0
+
+        # Test that an accepted reply is sent with the client's case and cached
+        dns_server.forward_to_upstream = make_upstream()
+        await dns_server.handle_request(QUERY, addr, sock)
+        response, sent_addr = sock.sent[0]
+        assert sent_addr == addr
+        assert response[:2] == b"\x12\x34"
+        assert response[12:-4] == QUERY[12:-4]
+        assert len(dns_server.dns_cache) == 1
+
+        # Test that a cache hit restores the transaction ID and the client's case
+        dns_server.forward_to_upstream = None
+        other = b"\xbe\xef" + QUERY[2:].replace(b"UpStream", b"UPSTREAM")
+        await dns_server.handle_request(other, addr, sock)
+        response, _ = sock.sent[1]
+        assert response[:2] == b"\xbe\xef"
+        assert b"\x08UPSTREAM\x07ExAmPle\x03NeT\x00" in response
+        assert response[2:4] == b"\x81\x80"
+    finally:
+        dns_server.forward_to_upstream = original
+        dns_server.flush_cache()
+
+def test_dns_server():
+    asyncio.run(run_dns_server())
+    print("DNS server tests passed.")
+
+if __name__ == "__main__":
+    test_dns_server()
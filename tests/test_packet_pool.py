@@ -0,0 +1,30 @@
+from lib.src.packet_pool import PacketBufferPool
+
+def test_packet_pool():
+    pool = PacketBufferPool(count=2, size=64)
+    assert pool.available() == 2
+
+    # Test acquiring preallocated buffers
+    first = pool.acquire()
+    second = pool.acquire()
+    assert len(first) == 64
+    assert first is not second
+    assert pool.available() == 0
+    assert pool.misses == 0
+
+    # Test exhausting the pool
+    extra = pool.acquire()
+    assert len(extra) == 64
+    assert pool.misses == 1
+
+    # Test releasing buffers back to the pool
+    pool.release(first)
+    pool.release(second)
+    pool.release(extra)
+    assert pool.available() == 2
+    assert pool.acquire() is second
+
+    print("Packet pool tests passed.")
+
+if __name__ == "__main__":
+    test_packet_pool()
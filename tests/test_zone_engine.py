@@ -0,0 +1,112 @@
+import struct
+
+from lib.src.dns_parser import parse_dns_query
+from lib.src.custom_resolver import (
+    load_zone_file,
+    resolve_zone,
+    list_zones,
+    ZONE_LOADED,
+    ZONE_UNCHANGED,
+    ZONE_ERROR,
+)
+from lib.src.zone_engine import parse_zone, parse_ttl, parse_ipv6, reverse_name
+
+ZONE = """$ORIGIN home.lan.
+$TTL 1h
+@       IN SOA  ns.home.lan. admin.home.lan. (
+                {serial} ; serial
+                3600 600 86400 300 )
+        IN NS   ns
+ns      IN A    192.168.1.2
+nas     300 IN A 192.168.1.10
+www     IN CNAME nas
+*.dev   IN A    192.168.1.30
+v6      IN AAAA fd00::1
+txt     IN TXT  "hello world" ; comment
+api.dev IN A    192.168.1.31
+""" + "".join(f'big     IN TXT  "{c * 200}"\n' for c in "abcde")
+
+def make_query(name, qtype=1):
+    labels = b"".join(bytes([len(part)]) + part.encode() for part in name.split("."))
+    return parse_dns_query(b"\xab\xcd\x01\x00\x00\x01\x00\x00\x00\x00\x00\x00" + labels + b"\x00" + struct.pack("!HH", qtype, 1))
+
+def header(response):
+    return struct.unpack_from("!HHHHHH", response, 0)
+
+def test_zone_engine():
+    test_file = "test_home.lan.zone"
+
+    # Test zone file parsing helpers
+    assert parse_ttl("1h30m") == 5400
+    assert parse_ipv6("fd00::1") == b"\xfd" + b"\x00" * 14 + b"\x01"
+    assert reverse_name(bytes([192, 168, 1, 10])) == ("10.1.168.192.in-addr.arpa", "1.168.192.in-addr.arpa")
+    records = list(parse_zone(ZONE.format(serial=1).splitlines(True)))
+    assert records[0][0] == "home.lan"
+    assert records[2] == ("ns.home.lan", 1, 3600, bytes([192, 168, 1, 2]))
+    assert records[3][2] == 300
+
+    # Test that a file without $ORIGIN takes the SOA owner as its origin
+    bare = ZONE.format(serial=1).replace("$ORIGIN home.lan.\n", "").replace("@  ", "home.lan.")
+    assert bare.startswith("$TTL 1h\nhome.lan.")
+    assert list(parse_zone(bare.splitlines(True))) == records
+
+    # Test loading and answering authoritatively, preserving the query case
+    with open(test_file, "w") as f:
+        f.write(ZONE.format(serial=1))
+    assert load_zone_file(test_file) == ZONE_LOADED
+    assert list_zones()["home.lan"] == 1
+    response = resolve_zone(make_query("NAS.home.lan"))
+    _, flags, _, ancount, nscount, _ = header(response)
+    assert flags & 0x0400 and flags & 0xF == 0
+    assert ancount == 1 and nscount == 0
+    assert b"\x03NAS\x04home\x03lan\x00" in response
+    assert response.endswith(bytes([192, 168, 1, 10]))
+
+    # Test CNAME, wildcard, NODATA and NXDOMAIN answers
+    assert header(resolve_zone(make_query("www.home.lan")))[3] == 1
+    assert resolve_zone(make_query("box.dev.home.lan")).endswith(bytes([192, 168, 1, 30]))
+    _, flags, _, ancount, _, _ = header(resolve_zone(make_query("v1.api.dev.home.lan")))
+    assert (flags & 0xF, ancount) == (3, 0)
+    _, flags, _, ancount, nscount, _ = header(resolve_zone(make_query("nas.home.lan", 28)))
+    assert (flags & 0xF, ancount, nscount) == (0, 0, 1)
+    _, flags, _, ancount, nscount, _ = header(resolve_zone(make_query("missing.home.lan")))
+    assert (flags & 0xF, ancount, nscount) == (3, 0, 1)
+    assert resolve_zone(make_query("example.com")) is None
+
+    # Test that an answer too large for UDP is truncated rather than forwarded
+    response = resolve_zone(make_query("big.home.lan", 16), bytearray(512))
+    _, flags, _, ancount, _, _ = header(response)
+    assert flags & 0x0200 and flags & 0x0400
+    assert (flags & 0xF, ancount) == (0, 0)
+
+    # Test generated reverse zones
+    response = resolve_zone(make_query("10.1.168.192.in-addr.arpa", 12))
+    assert header(response)[3] == 1
+    assert response.endswith(b"\x03nas\x04home\x03lan\x00")
+    assert resolve_zone(make_query("99.1.168.192.in-addr.arpa", 12)) is None
+    assert resolve_zone(make_query("1.168.192.in-addr.arpa", 6)) is None
+
+    # Test that reloading only recompiles when the serial changes
+    assert load_zone_file(test_file) == ZONE_UNCHANGED
+    with open(test_file, "w") as f:
+        f.write(ZONE.format(serial=2).replace("192.168.1.10", "192.168.1.11"))
+    assert load_zone_file(test_file) == ZONE_LOADED
+    assert resolve_zone(make_query("nas.home.lan")).endswith(bytes([192, 168, 1, 11]))
+    assert resolve_zone(make_query("10.1.168.192.in-addr.arpa", 12)) is None
+
+    # Test that a second file for the same zone is rejected
+    with open("test_copy.zone", "w") as f:
+        f.write(ZONE.format(serial=5))
+    assert load_zone_file("test_copy.zone") == ZONE_ERROR
+    assert list_zones()["home.lan"] == 2
+
+    # Test that a broken reload is reported and keeps the old zone
+    with open(test_file, "w") as f:
+        f.write(ZONE.format(serial=3).replace("IN A    192.168.1.2", "IN A    192.168.1"))
+    assert load_zone_file(test_file) == ZONE_ERROR
+    assert list_zones()["home.lan"] == 2
+
+    print("Zone engine tests passed.")
+
+if __name__ == "__main__":
+    test_zone_engine()